@@ -1,5 +1,384 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import SimpleITK as sitk
 import yaml
+from numba import njit, prange, types
+from scipy import ndimage
+from scipy.special import ive
+
+try:
+    import cupy as cp
+    import cupyx.scipy.ndimage as cp_ndimage
+    from cucim.skimage import morphology as cu_morphology
+    CUPY_AVAILABLE = True
+except ImportError:
+    cp = None
+    cp_ndimage = None
+    cu_morphology = None
+    CUPY_AVAILABLE = False
+
+
+def make_discrete_gaussian_kernel_1d(variance, max_width, max_error):
+    """
+    Construct a 1D discrete gaussian kernel, replicating the kernel that
+    `sitk.DiscreteGaussian` builds internally: exponentially-scaled modified
+    Bessel function coefficients, truncated when the residual error drops
+    below `max_error` or the support cap is hit, then renormalized.
+
+    Parameters
+    ----------
+    variance : float
+        Variance of the gaussian, in voxel units.
+
+    max_width : int
+        Cap on the one-sided support of the kernel, in voxels.
+
+    max_error : float
+        Maximum truncation error allowed when growing the kernel.
+
+    Returns
+    -------
+    numpy.ndarray
+        A 1D float32 array of length 2*radius+1 containing the normalized
+        kernel weights.
+    """
+
+    radius = 2
+    coeffs = ive(np.arange(radius + 1), variance)
+    while (1 - (coeffs[0] + 2*np.sum(coeffs[1:]))) > max_error:
+        if (radius + 1) > max_width:
+            break
+        radius += 1
+        coeffs = ive(np.arange(radius + 1), variance)
+
+    kernel = np.concatenate([coeffs[:0:-1], coeffs])
+    kernel /= kernel.sum()
+
+    return kernel.astype(np.float32)
+
+
+# input array types for the explicit kernel signatures below; declared
+# readonly so the kernels accept the immutable array views that sitk
+# images expose (writable arrays still match)
+_F32_VOL_RO = types.Array(types.float32, 3, 'C', readonly=True)
+_F32_KERNEL_RO = types.Array(types.float32, 1, 'C', readonly=True)
+_U8_VOL_RO = types.Array(types.uint8, 3, 'C', readonly=True)
+_I4_OFFSETS_RO = types.Array(types.int32, 2, 'C', readonly=True)
+
+
+@njit(
+    types.uint8[:, :, ::1](
+        _F32_VOL_RO, _F32_KERNEL_RO,
+        types.float32, types.float32, types.uint8,
+        _U8_VOL_RO, types.boolean
+    ),
+    parallel=True, fastmath=True, nogil=True, cache=True
+)
+def gauss_threshold_u8(vol, kernel, lower, upper, in_val, mask, use_mask):
+    """
+    Separable 3D gaussian convolution fused with a binary threshold.
+    Smooths `vol` with the 1D `kernel` along each axis (replicated edges)
+    and writes `in_val` where the smoothed value lies in [lower, upper],
+    0 elsewhere, without materializing a smoothed float volume for the
+    final pass. When `use_mask` is set, voxels where `mask` is zero are
+    read as zero, fusing the masking into the input load of the first
+    pass instead of requiring a masked copy of the volume.
+
+    Parameters
+    ----------
+    vol : numpy.ndarray
+        The input volume, float32 and C-contiguous.
+
+    kernel : numpy.ndarray
+        The 1D float32 convolution kernel, of odd length.
+
+    lower : float
+        Lower threshold for the binarization.
+
+    upper : float
+        Upper threshold for the binarization.
+
+    in_val : int
+        Value to assign to voxels inside the threshold band.
+
+    mask : numpy.ndarray
+        The uint8 binary mask; only read when `use_mask` is True.
+
+    use_mask : bool
+        Whether to zero out masked voxels on load.
+
+    Returns
+    -------
+    numpy.ndarray
+        The binarized uint8 volume.
+    """
+
+    nz, ny, nx = vol.shape
+    r = (kernel.shape[0] - 1) // 2
+    tmp = np.empty_like(vol)
+    out = np.empty(vol.shape, np.uint8)
+
+    # fused x- and y-axis passes, tiled one slab at a time: each thread
+    # convolves its slab into a private 2-D scratch buffer that stays
+    # resident in cache for the y-axis pass, instead of streaming a second
+    # full float volume through main memory between the two passes
+    for z in prange(nz):
+        slab = np.empty((ny, nx), vol.dtype)
+        for y in range(ny):
+            for x in range(nx):
+                acc = np.float32(0.0)
+                for k in range(-r, r + 1):
+                    xx = min(max(x + k, 0), nx - 1)
+                    v = vol[z, y, xx]
+                    if use_mask and mask[z, y, xx] == 0:
+                        v = np.float32(0.0)
+                    acc += kernel[k + r]*v
+                slab[y, x] = acc
+        for y in range(ny):
+            for x in range(nx):
+                acc = np.float32(0.0)
+                for k in range(-r, r + 1):
+                    yy = min(max(y + k, 0), ny - 1)
+                    acc += kernel[k + r]*slab[yy, x]
+                tmp[z, y, x] = acc
+
+    # z-axis pass, thresholding directly into the uint8 output; this pass
+    # reads across slabs, so it is parallelized over y-lines instead so
+    # that no two threads ever touch the same output line
+    for y in prange(ny):
+        for z in range(nz):
+            for x in range(nx):
+                acc = np.float32(0.0)
+                for k in range(-r, r + 1):
+                    zz = min(max(z + k, 0), nz - 1)
+                    acc += kernel[k + r]*tmp[zz, y, x]
+                out[z, y, x] = in_val if (lower <= acc) and (acc <= upper) else 0
+
+    return out
+
+
+@njit(
+    types.float32[:, :, ::1](
+        _F32_VOL_RO, _F32_KERNEL_RO, _U8_VOL_RO, types.boolean
+    ),
+    parallel=True, fastmath=True, nogil=True, cache=True
+)
+def gauss_smooth_f32(vol, kernel, mask, use_mask):
+    """
+    Separable 3D gaussian convolution, identical to `gauss_threshold_u8`
+    but writing the smoothed float volume instead of thresholding it, for
+    callers that need to threshold the same smoothing more than once.
+
+    Parameters
+    ----------
+    vol : numpy.ndarray
+        The input volume, float32 and C-contiguous.
+
+    kernel : numpy.ndarray
+        The 1D float32 convolution kernel, of odd length.
+
+    mask : numpy.ndarray
+        The uint8 binary mask; only read when `use_mask` is True.
+
+    use_mask : bool
+        Whether to zero out masked voxels on load.
+
+    Returns
+    -------
+    numpy.ndarray
+        The smoothed float32 volume.
+    """
+
+    nz, ny, nx = vol.shape
+    r = (kernel.shape[0] - 1) // 2
+    tmp = np.empty_like(vol)
+    out = np.empty_like(vol)
+
+    for z in prange(nz):
+        slab = np.empty((ny, nx), vol.dtype)
+        for y in range(ny):
+            for x in range(nx):
+                acc = np.float32(0.0)
+                for k in range(-r, r + 1):
+                    xx = min(max(x + k, 0), nx - 1)
+                    v = vol[z, y, xx]
+                    if use_mask and mask[z, y, xx] == 0:
+                        v = np.float32(0.0)
+                    acc += kernel[k + r]*v
+                slab[y, x] = acc
+        for y in range(ny):
+            for x in range(nx):
+                acc = np.float32(0.0)
+                for k in range(-r, r + 1):
+                    yy = min(max(y + k, 0), ny - 1)
+                    acc += kernel[k + r]*slab[yy, x]
+                tmp[z, y, x] = acc
+
+    for y in prange(ny):
+        for z in range(nz):
+            for x in range(nx):
+                acc = np.float32(0.0)
+                for k in range(-r, r + 1):
+                    zz = min(max(z + k, 0), nz - 1)
+                    acc += kernel[k + r]*tmp[zz, y, x]
+                out[z, y, x] = acc
+
+    return out
+
+
+# placeholder passed to the gaussian kernels when no mask is in use, so
+# the kernels keep a single compiled signature
+EMPTY_MASK = np.empty((1, 1, 1), dtype=np.uint8)
+
+
+# the 13 causal neighbour offsets of the forward raster scan, with their
+# chamfer weights (3 for face, 4 for edge, 5 for vertex neighbours); the
+# backward scan uses the negated offsets
+CHAMFER_OFFSETS = np.array(
+    [
+        [dz, dy, dx, 2 + abs(dz) + abs(dy) + abs(dx)]
+        for dz in (-1, 0, 1)
+        for dy in (-1, 0, 1)
+        for dx in (-1, 0, 1)
+        if (dz, dy, dx) < (0, 0, 0)
+    ],
+    dtype=np.int32
+)
+
+
+@njit(
+    types.int32[:, :, ::1](_U8_VOL_RO, _I4_OFFSETS_RO),
+    nogil=True, cache=True
+)
+def chamfer_345(mask, offsets):
+    """
+    Compute the 3-4-5 chamfer distance transform of a binary volume with
+    two integer min-add raster scans. For each nonzero voxel the result
+    is the approximate distance to the nearest zero voxel, on the chamfer
+    scale (3 units per face-neighbour step); zero voxels get 0. This is
+    the metric the reference IPL implementation uses for its ball
+    morphology.
+
+    Parameters
+    ----------
+    mask : numpy.ndarray
+        The binary uint8 volume to transform.
+
+    offsets : numpy.ndarray
+        The (13, 4) int32 array of causal neighbour offsets and weights
+        (`CHAMFER_OFFSETS`).
+
+    Returns
+    -------
+    numpy.ndarray
+        The int32 chamfer distance volume.
+    """
+
+    nz, ny, nx = mask.shape
+    big = np.int32(1 << 30)
+    dist = np.empty(mask.shape, np.int32)
+    for z in range(nz):
+        for y in range(ny):
+            for x in range(nx):
+                dist[z, y, x] = 0 if mask[z, y, x] == 0 else big
+
+    n_offsets = offsets.shape[0]
+
+    # forward raster scan
+    for z in range(nz):
+        for y in range(ny):
+            for x in range(nx):
+                best = dist[z, y, x]
+                if best == 0:
+                    continue
+                for i in range(n_offsets):
+                    zz = z + offsets[i, 0]
+                    yy = y + offsets[i, 1]
+                    xx = x + offsets[i, 2]
+                    if 0 <= zz < nz and 0 <= yy < ny and 0 <= xx < nx:
+                        cand = dist[zz, yy, xx] + offsets[i, 3]
+                        if cand < best:
+                            best = cand
+                dist[z, y, x] = best
+
+    # backward raster scan with the mirrored offsets
+    for z in range(nz - 1, -1, -1):
+        for y in range(ny - 1, -1, -1):
+            for x in range(nx - 1, -1, -1):
+                best = dist[z, y, x]
+                if best == 0:
+                    continue
+                for i in range(n_offsets):
+                    zz = z - offsets[i, 0]
+                    yy = y - offsets[i, 1]
+                    xx = x - offsets[i, 2]
+                    if 0 <= zz < nz and 0 <= yy < ny and 0 <= xx < nx:
+                        cand = dist[zz, yy, xx] + offsets[i, 3]
+                        if cand < best:
+                            best = cand
+                dist[z, y, x] = best
+
+    return dist
+
+
+@njit(
+    types.uint8[:, :, ::1](
+        types.Array(types.int32, 3, 'C', readonly=True),
+        types.int64, types.uint8, types.boolean
+    ),
+    parallel=True, nogil=True, cache=True
+)
+def pick_largest_u8(labels, num_components, in_val, invert):
+    """
+    Select the largest component of a labelled volume: one serial pass
+    accumulates the component-size histogram, the argmax picks the
+    biggest label, and one thread-parallel pass writes the uint8 mask,
+    with no intermediate size table or boolean volume. With `invert` set
+    the mask marks everything except the biggest component instead.
+
+    Parameters
+    ----------
+    labels : numpy.ndarray
+        The int32 labelled volume, with 0 as background.
+
+    num_components : int
+        The number of components in `labels`.
+
+    in_val : int
+        Value to assign to selected voxels.
+
+    invert : bool
+        Whether to select the complement of the biggest component.
+
+    Returns
+    -------
+    numpy.ndarray
+        The binary uint8 volume.
+    """
+
+    nz, ny, nx = labels.shape
+
+    hist = np.zeros(num_components + 1, np.int64)
+    for z in range(nz):
+        for y in range(ny):
+            for x in range(nx):
+                hist[labels[z, y, x]] += 1
+
+    biggest = 1
+    for lab in range(2, num_components + 1):
+        if hist[lab] > hist[biggest]:
+            biggest = lab
+
+    out = np.empty(labels.shape, np.uint8)
+    for z in prange(nz):
+        for y in range(ny):
+            for x in range(nx):
+                hit = labels[z, y, x] == biggest
+                out[z, y, x] = in_val if hit != invert else 0
+
+    return out
+
 
 class AutocontourKnee:
     """
@@ -42,6 +421,8 @@ class AutocontourKnee:
 
     peri_s4_close_radius : int
 
+    disable_final_close : bool
+
     endo_sigma : float
 
     endo_support : int
@@ -62,11 +443,11 @@ class AutocontourKnee:
 
     endo_close_radius : int
 
-    DEFAULT_MAX_ERROR : float
-        Needed for the procedural interface of the sitk gaussian filter.
+    backend : str
 
-    USE_SPACING : bool
-        Needed for the procedural interface of the sitk gaussian filter.
+    DEFAULT_MAX_ERROR : float
+        Maximum truncation error allowed when constructing the 1-D
+        discrete gaussian kernels.
 
     Methods
     -------
@@ -106,6 +487,7 @@ class AutocontourKnee:
         peri_s3_radius = 5,
         peri_s4_open_radius = 8,
         peri_s4_close_radius = 16,
+        disable_final_close = True,
         endo_sigma = 2,
         endo_support = 3,
         endo_lower = 1444, # was 550 mg HA/ccm
@@ -115,7 +497,8 @@ class AutocontourKnee:
         endo_min_number = 1000, # should be 300000 for full image,
         endo_open_close_radius = 15,
         endo_corner_open_radius = 3,
-        endo_close_radius = 50
+        endo_close_radius = 50,
+        backend = 'numpy'
         ):
         """
         Initialization method.
@@ -196,6 +579,13 @@ class AutocontourKnee:
             Radius for the morphological closing in step 4 of the method that
             estimates the periosteal mask. Default is 16 voxels.
 
+        disable_final_close : bool
+            Whether to skip the final large-radius closing in step 4 of the
+            method that estimates the periosteal mask. The closing smooths
+            the mask over concave surface features of the bone, which does
+            more harm than good on knee scans, so it is skipped by default.
+            Default is True.
+
         endo_sigma : float
             Variance to use for the gaussian filtering in the method
             that estimates the endosteal mask. Default is 2.
@@ -229,6 +619,16 @@ class AutocontourKnee:
 
         endo_close_radius : int
 
+        backend : str
+            Either 'numpy' or 'cupy'. With 'cupy', the array-level helpers
+            run on the GPU via cupy/cuCIM, with a single host-to-device
+            transfer on entry to each mask method and a single transfer
+            back at the end. Note that the cupy backend uses Euclidean
+            balls for the morphology while the numpy backend uses the
+            3-4-5 chamfer metric, so the masks can differ slightly at
+            component boundaries. Falls back to 'numpy' if cupy and cuCIM
+            are not importable. Default is 'numpy'.
+
         """
 
         self.in_value = in_value
@@ -254,6 +654,7 @@ class AutocontourKnee:
 
         self.peri_s4_open_radius = peri_s4_open_radius
         self.peri_s4_close_radius = peri_s4_close_radius
+        self.disable_final_close = disable_final_close
 
         self.endo_sigma = endo_sigma
         self.endo_support = endo_support
@@ -266,13 +667,329 @@ class AutocontourKnee:
         self.endo_corner_open_radius = endo_corner_open_radius
         self.endo_close_radius = endo_close_radius
 
+        if backend not in ('numpy', 'cupy'):
+            raise ValueError(f'unknown backend: {backend}')
+        if backend == 'cupy' and not CUPY_AVAILABLE:
+            backend = 'numpy'
+        self.backend = backend
+
         self.DEFAULT_MAX_ERROR = 0.01
-        self.USE_SPACING = False
+
+        # the 1-D gaussian kernels depend only on the filtering
+        # parameters, so build each distinct (sigma, support) pair once
+        # up front and share the arrays across all later calls
+        self._gaussian_kernels = {}
+        for sigma, support in [
+            (self.peri_s1_sigma, self.peri_s1_support),
+            (self.peri_s2_sigma, self.peri_s2_support),
+            (self.peri_s3_sigma, self.peri_s3_support),
+            (self.endo_sigma, self.endo_support),
+        ]:
+            self._get_gaussian_kernel(sigma, support)
+
+        # cached sitk filter objects, configured once and reused so that
+        # repeated calls do not pay for filter construction
+        self._mask_filter = sitk.MaskImageFilter()
+        self._and_filter = sitk.AndImageFilter()
+        self._or_filter = sitk.OrImageFilter()
+        self._not_filter = sitk.NotImageFilter()
+
+    def _get_gaussian_kernel(self, sigma, support):
+        """
+        Get the cached 1-D gaussian kernel for a parameter pair.
+
+        Parameters
+        ----------
+        sigma : float
+            Variance for the gaussian filtering.
+
+        support : int
+            Support for the gaussian filtering.
+
+        Returns
+        -------
+        numpy.ndarray
+            The 1-D float32 kernel.
+        """
+
+        key = (sigma, support)
+        if key not in self._gaussian_kernels:
+            self._gaussian_kernels[key] = make_discrete_gaussian_kernel_1d(
+                sigma, support, self.DEFAULT_MAX_ERROR
+            )
+
+        return self._gaussian_kernels[key]
+
+    def _backend_modules(self):
+        """
+        Get the array and ndimage modules for the active backend.
+
+        Returns
+        -------
+        (module, module)
+            (numpy, scipy.ndimage) or (cupy, cupyx.scipy.ndimage).
+        """
+
+        if self.backend == 'cupy':
+            return cp, cp_ndimage
+
+        return np, ndimage
+
+    def _to_backend_array(self, arr, dtype=None):
+        """
+        Move an array onto the active backend, as a C-contiguous copy.
+
+        Parameters
+        ----------
+        arr : numpy.ndarray
+            The array to move.
+
+        dtype : numpy.dtype, optional
+            Target dtype. Defaults to the array's dtype.
+
+        Returns
+        -------
+        numpy.ndarray or cupy.ndarray
+            The backend-resident array.
+        """
+
+        if self.backend == 'cupy':
+            return cp.ascontiguousarray(cp.asarray(arr), dtype=dtype)
+
+        return np.ascontiguousarray(arr, dtype=dtype)
+
+    def _to_numpy_array(self, arr):
+        """
+        Move a backend array back to the host, if it is not there already.
+
+        Parameters
+        ----------
+        arr : numpy.ndarray or cupy.ndarray
+            The array to move.
+
+        Returns
+        -------
+        numpy.ndarray
+            The host-resident array.
+        """
+
+        if self.backend == 'cupy':
+            return cp.asnumpy(arr)
+
+        return arr
+
+    def _ball_morphology(self, img, operation, radius):
+        """
+        Apply a spherical-structuring-element morphology operation to a
+        binary image, via the 3-4-5 chamfer distance transform on the
+        numpy backend or Euclidean-ball cuCIM morphology on the cupy
+        backend.
+
+        Parameters
+        ----------
+        img : sitk.Image
+            The binary image to filter.
+
+        operation : str
+            One of 'dilate', 'erode', 'open' or 'close'.
+
+        radius : int
+            The radius of the structuring element, in voxels.
+
+        Returns
+        -------
+        sitk.Image
+            The filtered binary image.
+        """
+
+        arr = self._to_backend_array(sitk.GetArrayViewFromImage(img))
+        if operation == 'dilate':
+            out = self._dilate_binary_array(arr, radius)
+        elif operation == 'erode':
+            out = self._erode_binary_array(arr, radius)
+        elif operation == 'open':
+            out = self._open_binary_array(arr, radius)
+        elif operation == 'close':
+            out = self._close_binary_array(arr, radius)
+        else:
+            raise ValueError(f'unknown morphology operation: {operation}')
+        img_out = sitk.GetImageFromArray(self._to_numpy_array(out))
+        img_out.CopyInformation(img)
+
+        return img_out
+
+    def _dilate_binary_array(self, arr, radius):
+        """
+        Dilate a binary array with a spherical structuring element by
+        thresholding the 3-4-5 chamfer distance transform of the
+        background, matching the metric of the reference IPL
+        implementation. The cost is independent of the radius, where
+        `sitk.BinaryDilate` scans the full ball neighbourhood at every
+        voxel.
+
+        Parameters
+        ----------
+        arr : numpy.ndarray
+            The binary array to dilate.
+
+        radius : int
+            The radius of the dilation, in voxels.
+
+        Returns
+        -------
+        numpy.ndarray
+            The dilated binary array, uint8.
+        """
+
+        if self.backend == 'cupy':
+            return cp.where(
+                cu_morphology.binary_dilation(
+                    arr != self.out_value, cu_morphology.ball(radius)
+                ),
+                cp.uint8(self.in_value), cp.uint8(self.out_value)
+            )
+
+        dist = chamfer_345(
+            (arr == self.out_value).view(np.uint8), CHAMFER_OFFSETS
+        )
+
+        return np.where(
+            dist <= 3*radius, np.uint8(self.in_value), np.uint8(self.out_value)
+        )
+
+    def _erode_binary_array(self, arr, radius):
+        """
+        Erode a binary array with a spherical structuring element by
+        thresholding the 3-4-5 chamfer distance transform of the
+        foreground, matching the metric of the reference IPL
+        implementation. The cost is independent of the radius, where
+        `sitk.BinaryErode` scans the full ball neighbourhood at every
+        voxel.
+
+        Parameters
+        ----------
+        arr : numpy.ndarray
+            The binary array to erode.
+
+        radius : int
+            The radius of the erosion, in voxels.
+
+        Returns
+        -------
+        numpy.ndarray
+            The eroded binary array, uint8.
+        """
+
+        if self.backend == 'cupy':
+            return cp.where(
+                cu_morphology.binary_erosion(
+                    arr != self.out_value, cu_morphology.ball(radius)
+                ),
+                cp.uint8(self.in_value), cp.uint8(self.out_value)
+            )
+
+        # the chamfer transform only distinguishes zero from nonzero, so
+        # the binary array can be passed straight through without
+        # materializing a boolean foreground volume first
+        dist = chamfer_345(arr, CHAMFER_OFFSETS)
+
+        return np.where(
+            dist > 3*radius, np.uint8(self.in_value), np.uint8(self.out_value)
+        )
+
+    def _open_binary_array(self, arr, radius):
+        """
+        Open a binary array with a spherical structuring element, as an
+        erosion followed by a dilation.
+
+        Parameters
+        ----------
+        arr : numpy.ndarray
+            The binary array to open.
+
+        radius : int
+            The radius of the opening, in voxels.
+
+        Returns
+        -------
+        numpy.ndarray
+            The opened binary array, uint8.
+        """
+
+        return self._dilate_binary_array(
+            self._erode_binary_array(arr, radius), radius
+        )
+
+    def _open_sparse_binary_array(self, arr, radius):
+        """
+        Open a binary array that is expected to be mostly empty,
+        restricting the morphology to the padded bounding box of the
+        nonzero voxels so the cost scales with the occupied region rather
+        than the whole volume.
+
+        Parameters
+        ----------
+        arr : numpy.ndarray
+            The binary array to open.
+
+        radius : int
+            The radius of the opening, in voxels.
+
+        Returns
+        -------
+        numpy.ndarray
+            The opened binary array, uint8.
+        """
+
+        xp, _ = self._backend_modules()
+        out = xp.zeros(arr.shape, dtype=xp.uint8)
+        coords = xp.argwhere(arr != 0)
+        if coords.shape[0] == 0:
+            return out
+        lo = self._to_numpy_array(coords.min(axis=0))
+        hi = self._to_numpy_array(coords.max(axis=0)) + 1
+        shape = np.array(arr.shape)
+        # pad by radius+1 so the dilation has room to grow back and every
+        # foreground voxel sees enough background to erode correctly
+        lo = np.maximum(lo - (radius + 1), 0)
+        hi = np.minimum(hi + radius + 1, shape)
+        sub = xp.ascontiguousarray(
+            arr[lo[0]:hi[0], lo[1]:hi[1], lo[2]:hi[2]]
+        )
+        out[lo[0]:hi[0], lo[1]:hi[1], lo[2]:hi[2]] = self._open_binary_array(
+            sub, radius
+        )
+
+        return out
+
+    def _close_binary_array(self, arr, radius):
+        """
+        Close a binary array with a spherical structuring element, as a
+        dilation followed by an erosion.
+
+        Parameters
+        ----------
+        arr : numpy.ndarray
+            The binary array to close.
+
+        radius : int
+            The radius of the closing, in voxels.
+
+        Returns
+        -------
+        numpy.ndarray
+            The closed binary array, uint8.
+        """
+
+        return self._erode_binary_array(
+            self._dilate_binary_array(arr, radius), radius
+        )
 
     def _gaussian_and_threshold(
         self, img,
         sigma, support,
-        lower, upper
+        lower, upper,
+        mask=None
         ):
         """
         Gaussian smooth and then binarize an image using a threshold filter.
@@ -294,20 +1011,157 @@ class AutocontourKnee:
         upper : float
             Upper threshold for the binarization.
 
+        mask : sitk.Image, optional
+            A binary mask; voxels where it is background are treated as
+            zero, without materializing a masked copy of the image.
+
         Returns
         -------
         sitk.Image
             The binarized image.
         """
 
-        # gaussian filtering
-        img_gauss = sitk.DiscreteGaussian(img, sigma, support, self.DEFAULT_MAX_ERROR, self.USE_SPACING)
-
-        # binary segmentation
-        img_segmented = sitk.BinaryThreshold(img_gauss, lower, upper, self.in_value, self.out_value)
+        img_segmented = sitk.GetImageFromArray(
+            self._to_numpy_array(
+                self._gaussian_and_threshold_array(
+                    self._to_backend_array(
+                        sitk.GetArrayViewFromImage(img), dtype=np.float32
+                    ),
+                    sigma, support, lower, upper,
+                    mask=(
+                        self._to_backend_array(sitk.GetArrayViewFromImage(mask))
+                        if mask is not None else None
+                    )
+                )
+            )
+        )
+        img_segmented.CopyInformation(img)
 
         return img_segmented
 
+    def _gaussian_and_threshold_array(
+        self, arr,
+        sigma, support,
+        lower, upper,
+        mask=None
+        ):
+        """
+        Gaussian smooth and then binarize an array, as a single fused pass
+        that skips the intermediate smoothed volume a two-filter sitk
+        pipeline would materialize.
+
+        Parameters
+        ----------
+        arr : numpy.ndarray
+            The input volume, float32 and C-contiguous.
+
+        sigma : float
+            Variance for the gaussian filtering.
+
+        support : int
+            Support for the gaussian filtering.
+
+        lower: float
+            Lower threshold for the binarization.
+
+        upper : float
+            Upper threshold for the binarization.
+
+        mask : numpy.ndarray, optional
+            A binary uint8 mask; voxels where it is background are treated
+            as zero on load.
+
+        Returns
+        -------
+        numpy.ndarray
+            The binarized uint8 array.
+        """
+
+        if self.backend == 'cupy':
+            return self._threshold_array(
+                self._gaussian_smooth_array(arr, sigma, support, mask=mask),
+                lower, upper
+            )
+
+        kernel = self._get_gaussian_kernel(sigma, support)
+
+        return gauss_threshold_u8(
+            arr, kernel,
+            np.float32(lower), np.float32(upper), np.uint8(self.in_value),
+            mask if mask is not None else EMPTY_MASK,
+            mask is not None
+        )
+
+    def _gaussian_smooth_array(self, arr, sigma, support, mask=None):
+        """
+        Gaussian smooth an array, returning the smoothed float volume.
+
+        Parameters
+        ----------
+        arr : numpy.ndarray or cupy.ndarray
+            The input volume, float32 and C-contiguous.
+
+        sigma : float
+            Variance for the gaussian filtering.
+
+        support : int
+            Support for the gaussian filtering.
+
+        mask : numpy.ndarray or cupy.ndarray, optional
+            A binary uint8 mask; voxels where it is background are treated
+            as zero on load.
+
+        Returns
+        -------
+        numpy.ndarray or cupy.ndarray
+            The smoothed float32 volume.
+        """
+
+        kernel = self._get_gaussian_kernel(sigma, support)
+
+        if self.backend == 'cupy':
+            smoothed = arr if mask is None else arr*(mask != 0)
+            kernel_dev = cp.asarray(kernel)
+            for axis in range(3):
+                smoothed = cp_ndimage.correlate1d(
+                    smoothed, kernel_dev, axis=axis, mode='nearest'
+                )
+            return smoothed
+
+        return gauss_smooth_f32(
+            arr, kernel,
+            mask if mask is not None else EMPTY_MASK,
+            mask is not None
+        )
+
+    def _threshold_array(self, arr, lower, upper):
+        """
+        Binarize an array with a band threshold.
+
+        Parameters
+        ----------
+        arr : numpy.ndarray or cupy.ndarray
+            The volume to binarize.
+
+        lower : float
+            Lower threshold for the binarization.
+
+        upper : float
+            Upper threshold for the binarization.
+
+        Returns
+        -------
+        numpy.ndarray or cupy.ndarray
+            The binarized uint8 volume.
+        """
+
+        xp, _ = self._backend_modules()
+
+        return xp.where(
+            (arr >= lower) & (arr <= upper),
+            xp.uint8(self.in_value), xp.uint8(0)
+        )
+
     def _get_largest_connected_component(self, img):
         """
         Get the largest connected component in a binary image.
@@ -324,12 +1178,91 @@ class AutocontourKnee:
             the input image.
         """
 
-        img_conn = sitk.ConnectedComponent(img, img, True)
-        img_conn = sitk.RelabelComponent(img_conn, sortByObjectSize=True)
-        img_conn = self.in_value*(img_conn == 1)
+        img_conn = sitk.GetImageFromArray(
+            self._to_numpy_array(
+                self._largest_connected_component_array(
+                    self._to_backend_array(sitk.GetArrayViewFromImage(img))
+                )
+            )
+        )
+        img_conn.CopyInformation(img)
 
         return img_conn
 
+    def _largest_connected_component_array(self, arr):
+        """
+        Get the largest connected component in a binary array.
+
+        Parameters
+        ----------
+        arr : numpy.ndarray
+            The binary array to filter.
+
+        Returns
+        -------
+        numpy.ndarray
+            A binary uint8 array containing only the largest connected
+            component from the input array.
+        """
+
+        # label and pick the argmax component size directly, rather than
+        # paying for a full size-sorted relabel of every voxel just to
+        # compare against label 1 afterwards
+        xp, xp_ndimage = self._backend_modules()
+        labels, num_components = xp_ndimage.label(
+            arr, structure=xp.ones((3, 3, 3))
+        )
+        if num_components == 0:
+            return xp.zeros(labels.shape, dtype=xp.uint8)
+
+        if self.backend == 'cupy':
+            sizes = cp.bincount(labels.ravel())
+            sizes[0] = 0
+            return cp.where(
+                labels == sizes.argmax(), cp.uint8(self.in_value), cp.uint8(0)
+            )
+
+        return pick_largest_u8(
+            labels, num_components, np.uint8(self.in_value), False
+        )
+
+    def _fill_background_islands_array(self, arr):
+        """
+        Keep only the largest connected component of the background of a
+        binary array, absorbing any enclosed background islands into the
+        foreground. Equivalent to invert, keep the largest connected
+        component, and invert back, but with a single labelling pass and
+        no intermediate inverted volumes.
+
+        Parameters
+        ----------
+        arr : numpy.ndarray
+            The binary array to filter.
+
+        Returns
+        -------
+        numpy.ndarray
+            The filled binary uint8 array.
+        """
+
+        xp, xp_ndimage = self._backend_modules()
+        labels, num_components = xp_ndimage.label(
+            arr == self.out_value, structure=xp.ones((3, 3, 3))
+        )
+        if num_components == 0:
+            return xp.full(arr.shape, xp.uint8(self.in_value))
+
+        if self.backend == 'cupy':
+            sizes = cp.bincount(labels.ravel())
+            sizes[0] = 0
+            return cp.where(
+                labels != sizes.argmax(), cp.uint8(self.in_value), cp.uint8(0)
+            )
+
+        return pick_largest_u8(
+            labels, num_components, np.uint8(self.in_value), True
+        )
+
     def _invert_binary_image(self, img):
         """
         Swap the foreground and background of a binary image.
@@ -345,7 +1278,15 @@ class AutocontourKnee:
             The inverted binary image.
         """
 
-        return self.in_value*(img!=self.in_value)
+        # a single in-place pass on the buffer, rather than the two separate
+        # full-volume filter passes the expression in_value*(img!=in_value)
+        # would expand to
+        arr = sitk.GetArrayFromImage(img)
+        np.subtract(self.in_value, arr, out=arr)
+        img_inverted = sitk.GetImageFromArray(arr)
+        img_inverted.CopyInformation(img)
+
+        return img_inverted
 
     def _close_with_connected_components(self, img, radius):
         """
@@ -368,28 +1309,47 @@ class AutocontourKnee:
             The filtered image.
         """
 
-        # dilate to close holes in cortex
-        img = sitk.BinaryDilate(
-            img, [radius]*3, sitk.sitkBall,
-            self.out_value, self.in_value
+        img_closed = sitk.GetImageFromArray(
+            self._to_numpy_array(
+                self._close_with_connected_components_array(
+                    self._to_backend_array(sitk.GetArrayViewFromImage(img)),
+                    radius
+                )
+            )
         )
+        img_closed.CopyInformation(img)
 
-        # invert the image to switch to background
-        img = self._invert_binary_image(img)
+        return img_closed
 
-        # perform connected components on background
-        img = self._get_largest_connected_component(img)
+    def _close_with_connected_components_array(self, arr, radius):
+        """
+        Array-level version of `_close_with_connected_components`.
 
-        # reinvert to get back to foreground
-        img = self._invert_binary_image(img)
+        Parameters
+        ----------
+        arr : numpy.ndarray
+            The binary array to filter.
 
-        # erode back the dilated bone volume
-        img = sitk.BinaryErode(
-            img, [radius]*3, sitk.sitkBall,
-            self.out_value, self.in_value
-        )
+        radius : int
+            The radius to use for the dilation and erosion.
 
-        return img
+        Returns
+        -------
+        numpy.ndarray
+            The filtered binary uint8 array.
+        """
+
+        # dilate to close holes in cortex by thresholding the distance
+        # transform of the background
+        dilated = self._dilate_binary_array(arr, radius)
+
+        # keep only the largest connected component of the background, so
+        # background islands enclosed by the cortex are absorbed into the
+        # foreground
+        filled = self._fill_background_islands_array(dilated)
+
+        # erode back the dilated bone volume
+        return self._erode_binary_array(filled, radius)
 
     def _open_with_connected_components(self, img, radius):
         """
@@ -413,19 +1373,13 @@ class AutocontourKnee:
         """
 
         # erode back the dilated bone volume
-        img = sitk.BinaryErode(
-            img, [radius]*3, sitk.sitkBall,
-            self.out_value, self.in_value
-        )
+        img = self._ball_morphology(img, 'erode', radius)
 
         # perform connected components on background
         img = self._get_largest_connected_component(img)
 
         # dilate to close holes in cortex
-        img = sitk.BinaryDilate(
-            img, [radius]*3, sitk.sitkBall,
-            self.out_value, self.in_value
-        )
+        img = self._ball_morphology(img, 'dilate', radius)
 
 
         return img
@@ -449,11 +1403,28 @@ class AutocontourKnee:
             The filtered binary image.
         """
 
-        # create an image of zeros as a base
-        img_cl = sitk.ConnectedComponent(img, img, True)
-        img_cl_min = sitk.RelabelComponent(img_cl, num_voxels, True)
+        # label and apply the size cut with a lookup into the component
+        # size table, keeping the output uint8 instead of carrying the
+        # 32-bit relabelled volume through a comparison and a multiply
+        xp, xp_ndimage = self._backend_modules()
+        arr = self._to_backend_array(sitk.GetArrayViewFromImage(img))
+        labels, num_components = xp_ndimage.label(
+            arr, structure=xp.ones((3, 3, 3))
+        )
+        if num_components == 0:
+            keep = xp.zeros(1, dtype=bool)
+        else:
+            sizes = xp.bincount(labels.ravel())
+            keep = sizes >= num_voxels
+            keep[0] = False
+        img_large = sitk.GetImageFromArray(
+            self._to_numpy_array(
+                xp.where(keep[labels], xp.uint8(self.in_value), xp.uint8(0))
+            )
+        )
+        img_large.CopyInformation(img)
 
-        return self.in_value*(img_cl_min>0)
+        return img_large
 
     def get_periosteal_mask(self, img):
         """
@@ -472,120 +1443,185 @@ class AutocontourKnee:
             A binary image that is the periosteal mask.
         """
 
+        # convert to a float array on the active backend once up front;
+        # everything below operates on arrays and only the final mask is
+        # wrapped back up as a sitk.Image, avoiding an image copy at every
+        # filter boundary (and, on the cupy backend, any intermediate
+        # host/device transfers)
+        arr = self._to_backend_array(
+            sitk.GetArrayViewFromImage(img), dtype=np.float32
+        )
+
         # STEP 1: Mask out the largest bone only
 
-        img_segmented = self._gaussian_and_threshold(
-            img, self.peri_s1_sigma, self.peri_s1_support,
+        seg = self._gaussian_and_threshold_array(
+            arr, self.peri_s1_sigma, self.peri_s1_support,
             self.peri_s1_lower, self.peri_s1_upper
         )
 
         # component labelling to keep only largest region
-        img_segmented = self._get_largest_connected_component(img_segmented)
-
-        # dilation
-        # !!!NOTE: I'm using a Euclidean metric for the structirng element,
-        # the IPL implementation uses the 3-4-5 chamfer metric. Feel free to
-        # swap out the code if you can figure out how to get the 3-4-5
-        # chamfer metric in SimpleITK
-
-        img_segmented = sitk.BinaryDilate(
-            img_segmented,
-            [self.peri_s1_radius]*3, sitk.sitkBall,
-            self.out_value, self.in_value
-        )
-
-        # invert the image to get the background
-        img_segmented = self._invert_binary_image(img_segmented)
+        seg = self._largest_connected_component_array(seg)
 
-        # connected components on the background
-        img_segmented = self._get_largest_connected_component(img_segmented)
+        # dilation, using the same 3-4-5 chamfer metric for the structuring
+        # element as the IPL implementation
 
-        # invert back to foreground
-        img_segmented = self._invert_binary_image(img_segmented)
+        seg = self._dilate_binary_array(seg, self.peri_s1_radius)
 
-        # mask the original image using this segmentation
-        img_masked = sitk.Mask(img, img_segmented)
+        # keep only the largest connected component of the background,
+        # filling in any enclosed background islands
+        seg = self._fill_background_islands_array(seg)
 
-        # and save the segmentation to use later
-        img_segmented_s1 = img_segmented
+        # save the segmentation to use later; it is applied as a fused
+        # mask inside the step 2 smoothing rather than as a masked copy
+        # of the volume
+        seg_s1 = seg
 
         # STEP 2: create a mask with a low threshold
 
-        # threshold using low threshold
-        img_segmented = self._gaussian_and_threshold(
-            img_masked, self.peri_s2_sigma, self.peri_s2_support,
-            self.peri_s2_lower, self.peri_s2_upper
+        # steps 2 and 3 use the same gaussian parameters by default, in
+        # which case the smoothed volume is materialized once here and
+        # thresholded twice, with step 3 only re-smoothing the thin band
+        # around voxels whose masking changed in between
+        share_gaussian = (
+            (self.peri_s2_sigma == self.peri_s3_sigma)
+            and (self.peri_s2_support == self.peri_s3_support)
         )
 
+        # threshold using low threshold
+        if share_gaussian:
+            smoothed = self._gaussian_smooth_array(
+                arr, self.peri_s2_sigma, self.peri_s2_support, mask=seg_s1
+            )
+            seg = self._threshold_array(
+                smoothed, self.peri_s2_lower, self.peri_s2_upper
+            )
+        else:
+            seg = self._gaussian_and_threshold_array(
+                arr, self.peri_s2_sigma, self.peri_s2_support,
+                self.peri_s2_lower, self.peri_s2_upper, mask=seg_s1
+            )
+
         # keep only largest component
-        img_segmented = self._get_largest_connected_component(img_segmented)
+        seg = self._largest_connected_component_array(seg)
 
         # dilate/conn comp/erode to close holes in cortex
-        img_segmented = self._close_with_connected_components(
-            img_segmented, self.peri_s2_radius
+        seg = self._close_with_connected_components_array(
+            seg, self.peri_s2_radius
         )
 
-        # now mask the image using the latest segmentation
-        img_masked = sitk.Mask(img, img_segmented)
-
-        # save the final segmentation from step 2
-        img_segmented_s2 = img_segmented
+        # save the final segmentation from step 2; like step 1's it is
+        # applied as a fused mask inside the step 3 smoothing
+        seg_s2 = seg
 
         # STEP 3: create another mask with a slightly higher threshold
 
         # gaussian blur and segment with higher threshold
-        img_segmented = self._gaussian_and_threshold(
-            img_masked, self.peri_s3_sigma, self.peri_s3_support,
-            self.peri_s3_lower, self.peri_s3_upper
-        )
+        if share_gaussian:
+            # the step 2 and step 3 smoothings can only differ within the
+            # kernel support of voxels whose masking changed, so reuse the
+            # step 2 smoothing everywhere and re-smooth only inside the
+            # bounding box of that band
+            seg = self._threshold_array(
+                smoothed, self.peri_s3_lower, self.peri_s3_upper
+            )
+            xp, _ = self._backend_modules()
+            changed = xp.argwhere(seg_s1 != seg_s2)
+            if changed.shape[0] > 0:
+                kernel = self._get_gaussian_kernel(
+                    self.peri_s3_sigma, self.peri_s3_support
+                )
+                r = (kernel.shape[0] - 1) // 2
+                lo = self._to_numpy_array(changed.min(axis=0))
+                hi = self._to_numpy_array(changed.max(axis=0)) + 1
+                shape = np.array(seg.shape)
+                # the recompute box carries an extra kernel radius of
+                # margin beyond the written band so that edge replication
+                # in the convolution cannot reach the written voxels
+                sub_lo = np.maximum(lo - 2*r, 0)
+                sub_hi = np.minimum(hi + 2*r, shape)
+                inner_lo = np.maximum(lo - r, 0)
+                inner_hi = np.minimum(hi + r, shape)
+                sub = xp.ascontiguousarray(
+                    arr[
+                        sub_lo[0]:sub_hi[0],
+                        sub_lo[1]:sub_hi[1],
+                        sub_lo[2]:sub_hi[2]
+                    ]
+                )
+                sub_mask = xp.ascontiguousarray(
+                    seg_s2[
+                        sub_lo[0]:sub_hi[0],
+                        sub_lo[1]:sub_hi[1],
+                        sub_lo[2]:sub_hi[2]
+                    ]
+                )
+                sub_seg = self._threshold_array(
+                    self._gaussian_smooth_array(
+                        sub, self.peri_s3_sigma, self.peri_s3_support,
+                        mask=sub_mask
+                    ),
+                    self.peri_s3_lower, self.peri_s3_upper
+                )
+                rel_lo = inner_lo - sub_lo
+                rel_hi = inner_hi - sub_lo
+                seg[
+                    inner_lo[0]:inner_hi[0],
+                    inner_lo[1]:inner_hi[1],
+                    inner_lo[2]:inner_hi[2]
+                ] = sub_seg[
+                    rel_lo[0]:rel_hi[0],
+                    rel_lo[1]:rel_hi[1],
+                    rel_lo[2]:rel_hi[2]
+                ]
+        else:
+            seg = self._gaussian_and_threshold_array(
+                arr, self.peri_s3_sigma, self.peri_s3_support,
+                self.peri_s3_lower, self.peri_s3_upper, mask=seg_s2
+            )
 
         # dilate/conn comp/erode to close holes in cortex
-        img_segmented = self._close_with_connected_components(
-            img_segmented, self.peri_s3_radius
+        seg = self._close_with_connected_components_array(
+            seg, self.peri_s3_radius
         )
 
-        # again, mask the image with the new segmentation
-        img_masked = sitk.Mask(img, img_segmented)
-
         # save the final segmentation from step 3
-        img_segmented_s3 = img_segmented
+        seg_s3 = seg
 
 
         # STEP 4: Create the final segmentation using the segmentations from
         # steps 2 and 3
 
-        # find where the two masks are different
-        img_segmented_diff = self.in_value*((img_segmented_s2==self.in_value)!=(img_segmented_s3==self.in_value))
+        # find where the two masks are different; with values in
+        # {0, in_value} the difference is a single fused xor pass
+        seg_diff = np.bitwise_xor(seg_s2, seg_s3)
 
-        # do an opening on the diff
-        img_segmented_diff_open = sitk.BinaryMorphologicalOpening(
-            img_segmented_diff, [self.peri_s4_open_radius]*3, sitk.sitkBall,
-            self.out_value, self.in_value
+        # do an opening on the diff; the diff is sparse, so the morphology
+        # is restricted to the bounding box of its nonzero voxels
+        seg_diff_open = self._open_sparse_binary_array(
+            seg_diff, self.peri_s4_open_radius
         )
 
         # combine this with the segmentation from step 3
-        peri_mask = self.in_value*sitk.Or(
-            img_segmented_s3 == self.in_value,
-            img_segmented_diff_open == self.in_value
-        )
+        peri_mask = np.bitwise_or(seg_s3, seg_diff_open)
 
         # perform a smoothening close
         # !!NOTE: This operation is in the original script but it seems to do
         # more harm than good on the knee scans: the bone surface is not convex
         # so ending with a high-radius close smooths the mask over concave
-        # surface features. Qualitatively, it seems to me like a candidate for
-        # improving the algorithm would be to replace this with an opening
-        peri_mask = sitk.BinaryMorphologicalClosing(
-            peri_mask,
-            [self.peri_s4_close_radius]*3, sitk.sitkBall,
-            self.in_value
-        )
+        # surface features, so it is now skipped unless explicitly re-enabled
+        if not self.disable_final_close:
+            peri_mask = self._close_binary_array(
+                peri_mask, self.peri_s4_close_radius
+            )
 
         # mask the final peri mask using the first rough mask we created in
         # step 1
-        peri_mask = sitk.Mask(peri_mask, img_segmented_s1)
+        np.bitwise_and(peri_mask, seg_s1, out=peri_mask)
 
-        return peri_mask
+        img_peri = sitk.GetImageFromArray(self._to_numpy_array(peri_mask))
+        img_peri.CopyInformation(img)
+
+        return img_peri
 
 
     def get_endosteal_mask(self, img, peri):
@@ -608,27 +1644,33 @@ class AutocontourKnee:
             A binary image that is the endosteal mask.
         """
 
-        # first, mask the image with the periosteal mask
-        img_masked = sitk.Mask(img, peri)
-
-        # next, do a gaussian and binarization to get a cortical mask
-        cort = self._gaussian_and_threshold(
-            img_masked, self.endo_sigma, self.endo_support,
-            self.endo_lower, self.endo_upper
-        )
-
-        # erode the peri mask to get the minimum cortical thickness
-        peri_eroded = sitk.BinaryErode(
-            peri, [self.endo_min_cort_th]*3, sitk.sitkBall,
-            self.out_value, self.in_value
-        )
+        # the cortical threshold and the periosteal erosion are independent
+        # of each other, and the numba kernels underneath both release the
+        # GIL, so overlap them on two threads
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            # a gaussian and binarization to get a cortical mask, with the
+            # periosteal mask fused into the smoothing's input load rather
+            # than applied as a masked copy of the image first
+            future_cort = executor.submit(
+                self._gaussian_and_threshold,
+                img, self.endo_sigma, self.endo_support,
+                self.endo_lower, self.endo_upper, peri
+            )
+
+            # erode the peri mask to get the minimum cortical thickness
+            future_peri_eroded = executor.submit(
+                self._ball_morphology, peri, 'erode', self.endo_min_cort_th
+            )
+
+            cort = future_cort.result()
+            peri_eroded = future_peri_eroded.result()
 
         # get an endosteal mask first guess by subtracting the cortical mask
         # from the periosteal mask
-        endo = self.in_value*sitk.And(peri,sitk.Not(cort))
+        endo = self.in_value*self._and_filter.Execute(peri, self._not_filter.Execute(cort))
 
         # now mask the endo mask using the eroded peri mask
-        endo = sitk.Mask(endo, peri_eroded)
+        endo = self._mask_filter.Execute(endo, peri_eroded)
 
         # invert the endo mask to get a cort mask (sort of)
         cort = self._invert_binary_image(endo)
@@ -638,10 +1680,10 @@ class AutocontourKnee:
 
         # mask out the regions outside of periosteal contour to keep
         # only the cortical bone region
-        cort = sitk.Mask(cort, peri)
+        cort = self._mask_filter.Execute(cort, peri)
 
         # get the trab region as the whole bone less the cortex
-        trab = self.in_value*sitk.And(peri, sitk.Not(cort))
+        trab = self.in_value*self._and_filter.Execute(peri, self._not_filter.Execute(cort))
 
         # keep only the largest connected region of trab
         trab = self._get_largest_connected_component(trab)
@@ -650,34 +1692,21 @@ class AutocontourKnee:
         # get rid of Tb speckles not connected to trab region
         trab = self._open_with_connected_components(trab, self.endo_open_radius)
 
-        trab = sitk.BinaryMorphologicalClosing(
-            trab,
-            [self.endo_open_close_radius]*3, sitk.sitkBall,
-            self.in_value
-        )
+        trab = self._ball_morphology(trab, 'close', self.endo_open_close_radius)
 
-        trab = sitk.Mask(trab, peri)
+        trab = self._mask_filter.Execute(trab, peri)
 
-        trab_open = sitk.BinaryMorphologicalOpening(
-            trab, [self.endo_open_close_radius]*3, sitk.sitkBall,
-            self.out_value, self.in_value
-        )
+        trab_open = self._ball_morphology(trab, 'open', self.endo_open_close_radius)
 
         # find where the inverse of trab and trab_open are not the same and call
         # it the corner mask
-        corners = self.in_value*sitk.And(trab, sitk.Not(trab_open))
+        corners = self.in_value*self._and_filter.Execute(trab, self._not_filter.Execute(trab_open))
 
-        corners = sitk.BinaryErode(
-            corners, [self.endo_corner_open_radius]*3, sitk.sitkBall,
-            self.out_value, self.in_value
-        )
+        corners = self._ball_morphology(corners, 'erode', self.endo_corner_open_radius)
 
         corners = self._extract_large_regions(corners, self.endo_min_number)
 
-        corners = sitk.BinaryDilate(
-            corners, [self.endo_corner_open_radius]*3, sitk.sitkBall,
-            self.out_value, self.in_value
-        )
+        corners = self._ball_morphology(corners, 'dilate', self.endo_corner_open_radius)
 
         corners = self._extract_large_regions(corners, self.endo_min_number)
 
@@ -688,28 +1717,24 @@ class AutocontourKnee:
 
 
 
-        trab = sitk.Or(trab, trab_open)
-        trab = sitk.Or(trab, corners)
+        trab = self._or_filter.Execute(trab, trab_open)
+        trab = self._or_filter.Execute(trab, corners)
 
-        trab = sitk.BinaryMorphologicalClosing(
-            trab,
-            [self.endo_close_radius]*3, sitk.sitkBall,
-            self.in_value
-        )
+        trab = self._ball_morphology(trab, 'close', self.endo_close_radius)
 
         # mask the trab mask with the eroded peri mask to ensure a minimum
         # cortical thickness
-        trab = sitk.Mask(trab, peri_eroded)
+        trab = self._mask_filter.Execute(trab, peri_eroded)
 
         # In the IPL script there is a slicewise component labelling filter
         # step here but you can't do that efficiently in SITK, and also it
         # doesnt really make sense to me to do that on a knee anyways
 
-        cort_final = self.in_value*sitk.And(peri, sitk.Not(trab))
+        cort_final = self.in_value*self._and_filter.Execute(peri, self._not_filter.Execute(trab))
 
         # Here is another slicewise component
         
-        trab_final = self.in_value*sitk.And(peri, sitk.Not(cort_final))
+        trab_final = self.in_value*self._and_filter.Execute(peri, self._not_filter.Execute(cort_final))
 
         return cort_final, trab_final
 